@@ -8,11 +8,15 @@ Usage:
     python3 generate_commit.py [--template TEMPLATE_FILE] [--interactive]
 """
 
+import functools
+import heapq
+import shutil
 import subprocess
 import sys
 import re
-from pathlib import Path
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 
 # Conventional commit types
@@ -29,15 +33,78 @@ COMMIT_TYPES = {
     'chore': 'Maintenance tasks'
 }
 
+# Commit type names and descriptions as parallel tuples for index access
+_TYPE_KEYS = tuple(COMMIT_TYPES)
+_TYPE_DESCS = tuple(COMMIT_TYPES.values())
 
-def run_git_command(command: List[str]) -> str:
-    """Run a git command and return the output."""
+# Interactive menu rows, rendered once; only the suggested-type marker varies
+_MENU_ROWS = tuple(
+    (typ, f"  {{marker}} {i}. {typ:10s} - {desc}")
+    for i, (typ, desc) in enumerate(zip(_TYPE_KEYS, _TYPE_DESCS), 1)
+)
+
+# Menu marker indexed by whether the row is the suggested type
+_MARKERS = (" ", "→")
+
+# Subject builders per commit type, called with (scope, file_desc).
+# Types without an entry fall back to the file description.
+_SUBJECT_BUILDERS = {
+    'feat': lambda scope, file_desc: f"add new feature in {scope or 'module'}",
+    'fix': lambda scope, file_desc: f"resolve issue in {scope or 'module'}",
+    'docs': lambda scope, file_desc: file_desc,
+}
+
+# Absolute path to git, resolved once. Together with close_fds=False this lets
+# subprocess spawn git through posix_spawn() instead of fork() + exec().
+# Descriptors opened by Python are non-inheritable, so nothing leaks to git.
+_GIT = shutil.which('git') or 'git'
+
+# Ticket number in branch names: feature/MKPC-0000, bugfix/PROJ-123, etc.
+_TICKET_RE = re.compile(r'([A-Z]+-\d+)')
+
+# Characters git escapes when it quotes a path for display (core.quotepath=off):
+# control characters, the quote and backslash, and bytes that are not valid UTF-8
+_QUOTE_RE = re.compile(r'[\x00-\x1f"\\\x7f\udc80-\udcff]')
+
+_QUOTE_ESCAPES = {
+    '\a': '\\a', '\b': '\\b', '\t': '\\t', '\n': '\\n',
+    '\v': '\\v', '\f': '\\f', '\r': '\\r', '"': '\\"', '\\': '\\\\',
+}
+
+# Keyword flags used to guess the commit type from the diff content
+_FIX, _FEAT, _REFACTOR = 1, 2, 4
+
+# Path flags used to guess the commit type from the staged file names
+_DOCS_PATH, _TEST_PATH, _YAML_PATH, _CI_PATH = 1, 2, 4, 8
+
+_YAML_SUFFIXES = frozenset({'.yml', '.yaml'})
+
+_FIX_KEYWORDS = frozenset({b'fix', b'bug', b'issue', b'patch'})
+_FEAT_KEYWORDS = frozenset({b'add', b'new', b'feature', b'implement'})
+_REFACTOR_KEYWORDS = frozenset({b'refactor', b'restructure', b'reorganize'})
+
+# Diff lines joined per keyword search, so matching runs over one buffer
+# per chunk instead of once per line
+_SCAN_CHUNK_LINES = 1024
+
+
+@functools.lru_cache(maxsize=64)
+def run_git_command(command: Tuple[str, ...]) -> bytes:
+    """
+    Run a git command and return the raw output.
+    
+    Output is left undecoded; callers decode the (small) parts they display.
+    Results are memoized per command tuple, so repeated lookups from a
+    long-running caller do not spawn git again. Call
+    run_git_command.cache_clear() after changing the index or HEAD.
+    """
     try:
         result = subprocess.run(
-            ['git'] + command,
+            ['git', *command],
+            executable=_GIT,
             capture_output=True,
-            text=True,
-            check=True
+            check=True,
+            close_fds=False
         )
         return result.stdout
     except subprocess.CalledProcessError as e:
@@ -45,26 +112,105 @@ def run_git_command(command: List[str]) -> str:
         sys.exit(1)
 
 
-def get_staged_diff() -> str:
-    """Get the diff of staged changes."""
-    return run_git_command(['diff', '--cached'])
+def iter_git_lines(command: Tuple[str, ...]) -> Iterator[bytes]:
+    """Run a git command and yield its output line by line as bytes."""
+    with subprocess.Popen(
+        ['git', *command],
+        executable=_GIT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        bufsize=-1,
+        close_fds=False
+    ) as process:
+        yield from process.stdout
+    if process.returncode:
+        e = subprocess.CalledProcessError(process.returncode, process.args)
+        print(f"Error running git command: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def get_staged_diff() -> Iterator[bytes]:
+    """Get the diff of staged changes as a stream of lines."""
+    return iter_git_lines(('diff', '--cached'))
 
 
 def get_staged_files() -> List[str]:
-    """Get list of staged files."""
-    output = run_git_command(['diff', '--cached', '--name-only'])
-    return [f for f in output.strip().split('\n') if f]
+    """
+    Get list of staged files.
+    
+    Names are returned raw, exactly as stored in the index (not quoted by git),
+    so they may contain newlines or other control characters. Pass them
+    through quote_path() before showing them.
+    """
+    output = run_git_command(('diff', '--cached', '--name-only', '-z'))
+    return [f.decode('utf-8', 'surrogateescape') for f in output.split(b'\0') if f]
 
 
 def get_current_branch() -> str:
     """Get current git branch name."""
     try:
-        output = run_git_command(['rev-parse', '--abbrev-ref', 'HEAD'])
-        return output.strip()
+        output = run_git_command(('rev-parse', '--abbrev-ref', 'HEAD'))
+        return output.strip().decode('utf-8', 'surrogateescape')
     except:
         return ''
 
 
+def get_staged_changes() -> Tuple[List[str], Iterator[bytes]]:
+    """
+    Get staged files and the staged diff.
+
+    The file list and the diff come from one `git diff --cached --patch-with-raw -z`
+    call: the NUL-separated raw section lists every staged path and is
+    terminated by an empty record, followed by the regular patch text.
+    Only the raw section is read here; the patch is returned as a line
+    stream so it is never held in memory as a whole.
+    """
+    lines = iter_git_lines(('diff', '--cached', '--patch-with-raw', '-z'))
+    raw = b''
+    for line in lines:
+        raw += line
+        if b'\0\0' in raw:
+            break
+    raw, _, first_line = raw.partition(b'\0\0')
+    diff = chain((first_line,), lines) if first_line else lines
+    
+    files = []
+    fields = iter(raw.decode('utf-8', 'surrogateescape').split('\0'))
+    for meta in fields:
+        if not meta.startswith(':'):
+            continue
+        path = next(fields, '')
+        # Renames and copies (R100, C075, ...) carry source and destination paths
+        if meta.rsplit(' ', 1)[-1][:1] in ('R', 'C'):
+            path = next(fields, path)
+        if path:
+            files.append(path)
+    
+    return files, diff
+
+
+def _escape_char(match: re.Match) -> str:
+    """Return the git-style escape sequence for one matched character."""
+    char = match.group()
+    if char in _QUOTE_ESCAPES:
+        return _QUOTE_ESCAPES[char]
+    return ''.join(f'\\{byte:03o}' for byte in char.encode('utf-8', 'surrogateescape'))
+
+
+def quote_path(path: str) -> str:
+    """
+    Quote a path for display the way git does with core.quotepath=off.
+    
+    Names containing control characters, quotes, backslashes or invalid
+    UTF-8 are wrapped in double quotes with C-style escapes, so a newline
+    in a file name cannot break the commit header. Other names, including
+    non-ASCII ones, are returned unchanged.
+    """
+    if not _QUOTE_RE.search(path):
+        return path
+    return f'"{_QUOTE_RE.sub(_escape_char, path)}"'
+
+
 def extract_ticket_number(branch_name: str) -> str:
     """
     Extract ticket number from branch name.
@@ -79,48 +225,101 @@ def extract_ticket_number(branch_name: str) -> str:
     if not branch_name:
         return ''
     
-    # Pattern: feature/MKPC-0000, bugfix/PROJ-123, etc.
-    match = re.search(r'([A-Z]+-\d+)', branch_name)
+    match = _TICKET_RE.search(branch_name)
     if match:
         return match.group(1)
     
     return ''
 
 
-def analyze_changes(diff: str, files: List[str]) -> Dict[str, any]:
+def scan_diff(diff: Iterable[bytes]) -> Tuple[int, int, int]:
+    """
+    Scan diff lines once, counting added/removed lines and collecting keyword flags.
+
+    Returns a tuple of (additions, deletions, flags) where flags is a bitmask
+    of _FIX, _FEAT and _REFACTOR.
+    """
+    additions = deletions = flags = 0
+    lines = iter(diff)
+    while True:
+        chunk = list(islice(lines, _SCAN_CHUNK_LINES))
+        if not chunk:
+            break
+        for line in chunk:
+            # Slice comparisons avoid a startswith() method call per test
+            marker = line[:1]
+            if marker == b'+':
+                if line[:3] != b'+++':
+                    additions += 1
+            elif marker == b'-':
+                if line[:3] != b'---':
+                    deletions += 1
+        # Keywords never span lines, so searching the joined chunk is equivalent.
+        # 'fix' wins over every other keyword, so stop matching once it is seen.
+        if not flags & _FIX:
+            lowered = b''.join(chunk).lower()
+            if any(kw in lowered for kw in _FIX_KEYWORDS):
+                flags |= _FIX
+            if not flags & _FEAT and any(kw in lowered for kw in _FEAT_KEYWORDS):
+                flags |= _FEAT
+            if not flags & _REFACTOR and any(kw in lowered for kw in _REFACTOR_KEYWORDS):
+                flags |= _REFACTOR
+    return additions, deletions, flags
+
+
+def analyze_changes(diff: Iterable[bytes], files: List[str]) -> Dict[str, any]:
     """Analyze the git diff and categorize changes."""
+    additions, deletions, flags = scan_diff(diff)
     analysis = {
         'files': files,
-        'additions': diff.count('\n+') - diff.count('\n+++'),
-        'deletions': diff.count('\n-') - diff.count('\n---'),
+        'additions': additions,
+        'deletions': deletions,
         'file_types': set(),
         'directories': set(),
+        'basenames': [],
         'likely_type': 'chore'
     }
     
-    # Analyze file types and directories
+    # Analyze file types, directories and basenames, and classify each path once
+    path_flags = 0
     for file in files:
-        path = Path(file)
-        if path.suffix:
-            analysis['file_types'].add(path.suffix)
-        if path.parent != Path('.'):
-            analysis['directories'].add(str(path.parent))
+        # git reports normalized '/'-separated paths, so plain string splits
+        # give the same parent and suffix as pathlib without building objects
+        head, _, name = file.rpartition('/')
+        dot = name.rfind('.')
+        if 0 < dot < len(name) - 1:
+            suffix = name[dot:]
+            analysis['file_types'].add(suffix)
+            if suffix in _YAML_SUFFIXES:
+                path_flags |= _YAML_PATH
+        if head:
+            analysis['directories'].add(head)
+            if 'ci' in head or '.github' in head:
+                path_flags |= _CI_PATH
+        analysis['basenames'].append(name)
+        
+        lowered = file.lower()
+        if '.md' in file or 'README' in file or 'doc' in lowered:
+            path_flags |= _DOCS_PATH
+        # The full path includes its directories, so this also covers test dirs
+        if 'test' in lowered:
+            path_flags |= _TEST_PATH
     
     # Determine likely commit type based on patterns
-    if any('.md' in f or 'README' in f or 'doc' in f.lower() for f in files):
+    if path_flags & _DOCS_PATH:
         analysis['likely_type'] = 'docs'
-    elif 'test' in str(analysis['directories']) or any('test' in f.lower() for f in files):
+    elif path_flags & _TEST_PATH:
         analysis['likely_type'] = 'test'
-    elif '.yml' in analysis['file_types'] or '.yaml' in analysis['file_types']:
-        if any('ci' in str(d) or '.github' in str(d) for d in analysis['directories']):
+    elif path_flags & _YAML_PATH:
+        if path_flags & _CI_PATH:
             analysis['likely_type'] = 'ci'
         else:
             analysis['likely_type'] = 'build'
-    elif re.search(r'(fix|bug|issue|patch)', diff, re.IGNORECASE):
+    elif flags & _FIX:
         analysis['likely_type'] = 'fix'
-    elif re.search(r'(add|new|feature|implement)', diff, re.IGNORECASE):
+    elif flags & _FEAT:
         analysis['likely_type'] = 'feat'
-    elif re.search(r'(refactor|restructure|reorganize)', diff, re.IGNORECASE):
+    elif flags & _REFACTOR:
         analysis['likely_type'] = 'refactor'
     
     return analysis
@@ -130,33 +329,28 @@ def determine_scope(analysis: Dict) -> str:
     """Determine the scope based on changed directories."""
     dirs = analysis['directories']
     if len(dirs) == 1:
-        return list(dirs)[0].split('/')[-1]
+        return quote_path(list(dirs)[0].split('/')[-1])
     elif len(dirs) > 1:
         # Find common prefix
-        common = Path(sorted(dirs)[0])
-        if common.name:
-            return common.name
+        common = sorted(dirs)[0].rpartition('/')[2]
+        if common:
+            return quote_path(common)
     return ''
 
 
 def generate_subject(commit_type: str, scope: str, files: List[str], analysis: Dict) -> str:
     """Generate a commit subject line."""
+    basenames = [quote_path(name) for name in analysis['basenames'][:3]]
     if len(files) == 1:
-        file_desc = f"update {Path(files[0]).name}"
+        file_desc = f"update {basenames[0]}"
     elif len(files) <= 3:
-        file_desc = f"update {', '.join(Path(f).name for f in files[:3])}"
+        file_desc = f"update {', '.join(basenames[:3])}"
     else:
         file_desc = f"update {len(files)} files"
     
     # Customize based on commit type
-    if commit_type == 'feat':
-        subject = f"add new feature in {scope or 'module'}"
-    elif commit_type == 'fix':
-        subject = f"resolve issue in {scope or 'module'}"
-    elif commit_type == 'docs':
-        subject = file_desc
-    else:
-        subject = file_desc
+    builder = _SUBJECT_BUILDERS.get(commit_type)
+    subject = builder(scope, file_desc) if builder else file_desc
     
     return subject[:50]  # Limit to 50 characters
 
@@ -167,8 +361,8 @@ def generate_body(analysis: Dict) -> str:
     
     if analysis['files']:
         lines.append("Changes:")
-        for file in sorted(analysis['files'])[:10]:  # Show up to 10 files
-            lines.append(f"  - {file}")
+        for file in heapq.nsmallest(10, analysis['files']):  # Show up to 10 files
+            lines.append(f"  - {quote_path(file)}")
         if len(analysis['files']) > 10:
             lines.append(f"  ... and {len(analysis['files']) - 10} more files")
     
@@ -203,26 +397,27 @@ def generate_commit_message(analysis: Dict, commit_type: str = None, ticket_numb
 
 def interactive_mode(analysis: Dict, ticket_number: str = '') -> str:
     """Interactive mode to let user customize the commit message."""
-    print("\n=== Git Commit Message Generator ===\n")
+    out = ["\n=== Git Commit Message Generator ===\n"]
     
     if ticket_number:
-        print(f"📌 Detected ticket: {ticket_number}")
+        out.append(f"📌 Detected ticket: {ticket_number}")
     
-    print(f"Detected changes in {len(analysis['files'])} files")
-    print(f"Suggested type: {analysis['likely_type']}")
-    print(f"\nAvailable types:")
-    for i, (typ, desc) in enumerate(COMMIT_TYPES.items(), 1):
-        marker = "→" if typ == analysis['likely_type'] else " "
-        print(f"  {marker} {i}. {typ:10s} - {desc}")
+    out.append(f"Detected changes in {len(analysis['files'])} files")
+    out.append(f"Suggested type: {analysis['likely_type']}")
+    out.append("\nAvailable types:")
+    suggested = analysis['likely_type']
+    out.extend(
+        row.format(marker=_MARKERS[typ == suggested]) for typ, row in _MENU_ROWS
+    )
     
-    print("\nPress Enter to use suggested type, or enter number (1-10):")
+    out.append("\nPress Enter to use suggested type, or enter number (1-10):")
+    sys.stdout.write('\n'.join(out) + '\n')
     choice = input().strip()
     
     if choice and choice.isdigit():
-        types_list = list(COMMIT_TYPES.keys())
         idx = int(choice) - 1
-        if 0 <= idx < len(types_list):
-            commit_type = types_list[idx]
+        if 0 <= idx < len(_TYPE_KEYS):
+            commit_type = _TYPE_KEYS[idx]
         else:
             commit_type = analysis['likely_type']
     else:
@@ -233,19 +428,19 @@ def interactive_mode(analysis: Dict, ticket_number: str = '') -> str:
 
 def main():
     """Main entry point."""
+    staged_files, diff = get_staged_changes()
+    
     # Check if there are staged changes
-    staged_files = get_staged_files()
     if not staged_files:
         print("No staged changes found. Use 'git add' to stage changes first.")
         sys.exit(1)
     
-    # Get current branch and extract ticket number
-    branch_name = get_current_branch()
-    ticket_number = extract_ticket_number(branch_name)
-    
-    # Get diff and analyze
-    diff = get_staged_diff()
-    analysis = analyze_changes(diff, staged_files)
+    # Look up the branch on a worker thread while the diff is streamed and
+    # analyzed, so rev-parse runs alongside the git diff process
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        branch_name = executor.submit(get_current_branch)
+        analysis = analyze_changes(diff, staged_files)
+    ticket_number = extract_ticket_number(branch_name.result())
     
     # Check for interactive mode
     interactive = '--interactive' in sys.argv or '-i' in sys.argv
@@ -255,20 +450,21 @@ def main():
     else:
         message = generate_commit_message(analysis, ticket_number=ticket_number)
     
-    # Output the commit message
-    print("\n" + "="*60)
-    print("Generated Commit Message:")
-    print("="*60)
-    print(message)
-    print("="*60)
-    
-    # Show usage instructions
+    # Output the commit message and usage instructions in a single write
     commit_msg_preview = message.split('\n')[0]
-    print("\nTo use this message:")
-    print(f"  git commit -m '{commit_msg_preview}'")
-    print("\nOr for multi-line commit:")
-    print("  git commit")
-    print("  # Then paste the full message in your editor")
+    out = [
+        "\n" + "="*60,
+        "Generated Commit Message:",
+        "="*60,
+        message,
+        "="*60,
+        "\nTo use this message:",
+        f"  git commit -m '{commit_msg_preview}'",
+        "\nOr for multi-line commit:",
+        "  git commit",
+        "  # Then paste the full message in your editor",
+    ]
+    sys.stdout.write('\n'.join(out) + '\n')
 
 
 if __name__ == "__main__":